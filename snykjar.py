@@ -7,6 +7,9 @@ import hashlib
 import sys
 import io
 import os
+import time
+import heapq
+import itertools
 import pkg_resources
 from pathlib import Path
 import xml.etree.ElementTree as ET
@@ -16,6 +19,18 @@ from xml.dom import minidom
 org_id = None
 snyk_api_base_url = 'https://snyk.io/api/v1/'
 
+# Scheduler task priorities - lower values run first. Cheap, high-confidence work (hash lookups,
+# embedded poms, testing packages those identified) runs before expensive, low-confidence work
+# (Maven filename searches and testing the candidates they return).
+priority_hash_lookup = 0
+priority_jar_contents = 1
+priority_test_identified_package = 2
+priority_filename_lookup = 3
+priority_test_filename_candidate = 4
+
+# Upper bound in seconds on each connect/read wait of an HTTP request made while a --timeBudget deadline is set
+max_request_timeout = 30
+
 
 def parse_command_line_args(command_line_args):
     parser = argparse.ArgumentParser(description="Snyk API Examples")
@@ -31,11 +46,24 @@ def parse_command_line_args(command_line_args):
     parser.add_argument('--outputPom', type=str,
                         help='Optional: name or path of pom.xml file in which to list of detected Java packages.')
 
+    parser.add_argument('--timeBudget', '--time-budget', type=float,
+                        help='Optional: total time in seconds to spend identifying and testing jars. Work not started '
+                             'within the budget is skipped and the affected jars are marked in the results.')
+
+    parser.add_argument('--maxCandidates', type=int,
+                        help='Optional: maximum number of packages to test for a jar identified only by its filename.')
+
     args = parser.parse_args(command_line_args)
 
     if not args.jar_path:
         parser.error('You must specify jar(s) to test')
 
+    if args.timeBudget is not None and args.timeBudget <= 0:
+        parser.error('--timeBudget must be greater than 0')
+
+    if args.maxCandidates is not None and args.maxCandidates < 1:
+        parser.error('--maxCandidates must be at least 1')
+
     return args
 
 
@@ -77,7 +105,7 @@ def validate_token(snyk_token):
     return resp.ok
 
 
-def snyk_test_java_package(snyk_token, package_group_id, package_artifact_id, package_version):
+def snyk_test_java_package(snyk_token, package_group_id, package_artifact_id, package_version, timeout=None):
     print('Snyk test package %s:%s@%s...' % (package_group_id, package_artifact_id, package_version))
 
     if org_id:
@@ -90,7 +118,7 @@ def snyk_test_java_package(snyk_token, package_group_id, package_artifact_id, pa
     # https://snyk.docs.apiary.io/#reference/test/maven/test-for-issues-in-a-public-package-by-group-id,-artifact-id-and-version
 
     snyk_api_headers = get_snyk_api_headers(snyk_token)
-    resp = requests.get(full_api_url, headers=snyk_api_headers)
+    resp = requests.get(full_api_url, headers=snyk_api_headers, timeout=timeout)
     json_res = resp.json()
 
     all_vulnerability_issues = json_res['issues']['vulnerabilities']
@@ -158,7 +186,7 @@ def compute_file_sha1(file_path):
     return hash_str
 
 
-def get_package_info_by_jar_filename(jar_path):
+def get_package_info_by_jar_filename(jar_path, timeout=None):
     all_package_results = []
 
     split_on_slash = jar_path.split('/')
@@ -179,7 +207,7 @@ def get_package_info_by_jar_filename(jar_path):
 
     maven_api_url = 'https://search.maven.org/solrsearch/select?q=a:"%s" AND v:"%s"&wt=json' % (a, v)
 
-    resp = requests.get(maven_api_url)
+    resp = requests.get(maven_api_url, timeout=timeout)
     json_resp = resp.json()
     # print(json_resp)
 
@@ -201,16 +229,20 @@ def get_package_info_by_jar_filename(jar_path):
     return all_package_results
 
 
-def get_package_info_by_jar_file_hash(jar_path):
+def get_package_info_by_jar_file_hash(jar_path, hash_cache=None, timeout=None):
     jar_file_stats = os.stat(jar_path)
     if jar_file_stats.st_size == 0:
         print('warning: JAR file size is 0')
         return []
 
     jar_hash_str = compute_file_sha1(jar_path)
+    if hash_cache is not None and jar_hash_str in hash_cache:
+        print('Using cached lookup for SHA1 %s' % jar_hash_str)
+        return hash_cache[jar_hash_str]
+
     maven_api_url = 'https://search.maven.org/solrsearch/select?q=1:"%s"' % jar_hash_str
 
-    resp = requests.get(maven_api_url)
+    resp = requests.get(maven_api_url, timeout=timeout)
     json_resp = resp.json()
 
     all_package_results = []
@@ -229,6 +261,9 @@ def get_package_info_by_jar_file_hash(jar_path):
 
         all_package_results.append(package_info)
 
+    if hash_cache is not None:
+        hash_cache[jar_hash_str] = all_package_results
+
     return all_package_results
 
 
@@ -269,57 +304,156 @@ def get_package_info_by_analyzing_jar_contents(jar_path):
     return all_package_results
 
 
-def analyze_jar(jar_path, snyk_token, do_snyk_test):
-    print('Identifying package for %s' % jar_path)
-
-    matching_packages_from_hash_lookup = []
-    matching_packages_from_hash_lookup = get_package_info_by_jar_file_hash(jar_path)
-
-    # Analyze by searching for pom.xml files in the JAR which identify the package
-    matching_packages_from_jar_contents = []
-    if not matching_packages_from_hash_lookup:
-        matching_packages_from_jar_contents = get_package_info_by_analyzing_jar_contents(jar_path)
-
-    matching_packages_from_filename_lookup = []
-    if not matching_packages_from_hash_lookup:
-        # Analyze by trying to resolve the package by JAR filename - the least reliable way to ID a jar
-        matching_packages_from_filename_lookup = get_package_info_by_jar_filename(jar_path)
-
-    results = []
-    packages_to_test = []
-
-    if len(matching_packages_from_hash_lookup) > 0:
-        packages_to_test = matching_packages_from_hash_lookup
-
-    elif len(matching_packages_from_jar_contents) > 0:
-        # test the packages identified by pom.xml files in the JAR
-        packages_to_test = matching_packages_from_jar_contents
-
-    elif len(matching_packages_from_filename_lookup) > 0:
-        # no pom.xml found - have to rely on Maven lookup
-        # there may be more than one package with the matching artifact/version
-        packages_to_test = matching_packages_from_filename_lookup
+def analyze_jars(jar_paths, snyk_token, do_snyk_test, time_budget=None, max_candidates=None, clock=time.monotonic):
+    # Every identification step and Snyk test is a task in one priority queue shared by all the jars, so
+    # filename lookups and filename candidate tests only run once no cheaper, more reliable work is waiting.
+    # Tasks still queued when time_budget (seconds) runs out are skipped and their jar is flagged. While a deadline
+    # is set, each HTTP request's connect and per-read waits are bounded by the remaining budget (at most
+    # max_request_timeout), so a slow response that keeps sending data can still run past the deadline.
+    deadline = clock() + time_budget if time_budget is not None else None
+
+    jar_states = []
+    for j in jar_paths:
+        jar_states.append({
+            'jar': j,
+            'packages': [],
+            'issues': {},
+            'skipped': {},
+            'time-budget-exceeded': False
+        })
+
+    hash_cache = {}
+    test_cache = {}
+    task_queue = []
+    task_counter = itertools.count()  # keeps tasks with the same priority in the order they were scheduled
+
+    def get_cached_package_info_by_jar_file_hash(jar_path):
+        if not hash_cache or os.stat(jar_path).st_size == 0:
+            return None
+        return hash_cache.get(compute_file_sha1(jar_path))
+
+    def schedule(priority, task, jar_index, package=None):
+        heapq.heappush(task_queue, (priority, next(task_counter), task, jar_index, package))
+
+    def schedule_tests(jar_index, packages, priority, limit=None):
+        if not do_snyk_test:
+            return
+        if limit is not None and len(packages) > limit:
+            print('Testing %s of %s candidate packages for %s' % (limit, len(packages), jar_states[jar_index]['jar']))
+            for p in packages[limit:]:
+                jar_states[jar_index]['skipped'][p['fullId']] = 'max-candidates'
+            packages = packages[:limit]
+        for p in packages:
+            schedule(priority, 'test', jar_index, p)
+
+    for i in range(len(jar_states)):
+        schedule(priority_hash_lookup, 'hash', i)
+
+    while task_queue:
+        priority, _, task, i, package = heapq.heappop(task_queue)
+        state = jar_states[i]
+        jar_path = state['jar']
+
+        # a package already tested for another jar costs nothing, so serve it even after the deadline
+        if task == 'test' and package['fullId'] in test_cache:
+            state['issues'][package['fullId']] = test_cache[package['fullId']]
+            continue
+
+        # read the clock once so the timeout below is always positive when the deadline has not passed
+        now = clock()
+        if deadline is not None and now >= deadline:
+            # a jar with the same SHA1 as one already looked up costs nothing either
+            cached_packages = get_cached_package_info_by_jar_file_hash(jar_path) if task == 'hash' else None
+            if cached_packages:
+                state['packages'] = cached_packages
+                schedule_tests(i, cached_packages, priority_test_identified_package)
+                continue
+
+            state['time-budget-exceeded'] = True
+            if task == 'test':
+                state['skipped'][package['fullId']] = 'time-budget'
+            continue
+
+        timeout = min(deadline - now, max_request_timeout) if deadline is not None else None
+
+        try:
+            if task == 'hash':
+                print('Identifying package for %s' % jar_path)
+                packages = get_package_info_by_jar_file_hash(jar_path, hash_cache, timeout=timeout)
+                if packages:
+                    state['packages'] = packages
+                    schedule_tests(i, packages, priority_test_identified_package)
+                else:
+                    # Analyze by searching for pom.xml files in the JAR which identify the package
+                    schedule(priority_jar_contents, 'contents', i)
+
+            elif task == 'contents':
+                packages = get_package_info_by_analyzing_jar_contents(jar_path)
+                if packages:
+                    state['packages'] = packages
+                    schedule_tests(i, packages, priority_test_identified_package)
+                else:
+                    schedule(priority_filename_lookup, 'filename', i)
+
+            elif task == 'filename':
+                # no pom.xml found - have to rely on Maven lookup
+                # there may be more than one package with the matching artifact/version
+                packages = get_package_info_by_jar_filename(jar_path, timeout=timeout)
+                if packages:
+                    state['packages'] = packages
+                    schedule_tests(i, packages, priority_test_filename_candidate, max_candidates)
+                else:
+                    # no package identified
+                    print('No package identified for %s' % jar_path)
+
+            elif task == 'test':
+                full_id = package['fullId']
+                test_cache[full_id] = snyk_test_java_package(
+                    snyk_token, package['groupId'], package['artifactId'], package['version'],
+                    timeout=timeout)
+                state['issues'][full_id] = test_cache[full_id]
+
+        except requests.exceptions.Timeout:
+            if deadline is not None and clock() >= deadline:
+                print('Request timed out - time budget exceeded for %s' % jar_path)
+                state['time-budget-exceeded'] = True
+                if task == 'test':
+                    state['skipped'][package['fullId']] = 'time-budget'
+            else:
+                # hit max_request_timeout with budget to spare - treat it as a failed lookup/test
+                print('Request timed out for %s' % jar_path)
+                if task == 'hash':
+                    schedule(priority_jar_contents, 'contents', i)
+                elif task == 'filename':
+                    print('No package identified for %s' % jar_path)
+                elif task == 'test':
+                    state['skipped'][package['fullId']] = 'request-timeout'
+
+    all_results = []
+    for state in jar_states:
+        results = []
+        for p in state['packages']:
+            issues = state['issues'].get(p['fullId'])
+
+            new_res = {
+                'fullId': p['fullId'],
+                'groupId': p['groupId'],
+                'artifactId': p['artifactId'],
+                'version': p['version'],
+                'vulnerabilities': issues['vulnerabilities'] if issues else None,
+                'license-issues': issues['licenses'] if issues else None,
+                'skipped': state['skipped'].get(p['fullId'])
+            }
+            results.append(new_res)
 
-    else:
-        # no package identified
-        print('No package identified for %s' % jar_path)
-
-    for p in packages_to_test:
-        issues = None
-        if do_snyk_test:
-            issues = snyk_test_java_package(snyk_token, p['groupId'], p['artifactId'], p['version'])
-
-        new_res = {
-            'fullId': p['fullId'],
-            'groupId': p['groupId'],
-            'artifactId': p['artifactId'],
-            'version': p['version'],
-            'vulnerabilities': issues['vulnerabilities'] if issues else None,
-            'license-issues': issues['licenses'] if issues else None
+        obj = {
+            'jar': state['jar'],
+            'matching-packages': results,
+            'time-budget-exceeded': state['time-budget-exceeded']
         }
-        results.append(new_res)
+        all_results.append(obj)
 
-    return results
+    return all_results
 
 
 def get_list_of_jars_in_directory(directory_path):
@@ -431,16 +565,16 @@ def main(args):
     do_snyk_test = False if args.outputPom else True
 
     if jars_to_test:
-        all_results = []
-        for j in jars_to_test:
-            print('Analyzing jar %s...' % j)
-            jar_results = analyze_jar(j, snyk_token, do_snyk_test)
-
-            obj = {
-                'jar': j,
-                'matching-packages': jar_results
-            }
-            all_results.append(obj)
+        print('Analyzing %s jar(s)...' % len(jars_to_test))
+        all_results = analyze_jars(jars_to_test, snyk_token, do_snyk_test, args.timeBudget, args.maxCandidates)
+        print()
+
+        jars_over_budget = [r['jar'] for r in all_results if r['time-budget-exceeded']]
+        if jars_over_budget:
+            print('Time budget of %ss exceeded - %s jar(s) not fully identified/tested:' % (
+                args.timeBudget, len(jars_over_budget)))
+            for j in jars_over_budget:
+                print('  %s' % j)
             print()
 
         if do_snyk_test and args.jsonOutput:
@@ -1,4 +1,5 @@
 import snykjar
+import pytest
 
 
 def test_arg_parsing_works_for_single_dot():
@@ -89,3 +90,32 @@ def test_arg_parsing_handles_outputPom_parameter():
     assert args.jar_path[0] == cl_args[1]
     assert args.jar_path[1] == cl_args[2]
     assert args.jar_path[2] == cl_args[3]
+
+
+def test_arg_parsing_handles_time_budget_parameters():
+    cl_args = ['somejar1.jar']
+    args = snykjar.parse_command_line_args(cl_args)
+    assert args.timeBudget is None
+    assert args.maxCandidates is None
+
+    cl_args = ['--timeBudget=30', '--maxCandidates=3', 'somejar1.jar']
+    args = snykjar.parse_command_line_args(cl_args)
+    assert args.timeBudget == 30.0
+    assert args.maxCandidates == 3
+    assert args.jar_path[0] == 'somejar1.jar'
+
+    cl_args = ['--time-budget=2.5', 'somejar1.jar']
+    args = snykjar.parse_command_line_args(cl_args)
+    assert args.timeBudget == 2.5
+
+
+def test_arg_parsing_rejects_invalid_time_budget():
+    for value in ['0', '-5']:
+        with pytest.raises(SystemExit):
+            snykjar.parse_command_line_args(['--timeBudget=%s' % value, 'somejar1.jar'])
+
+
+def test_arg_parsing_rejects_invalid_max_candidates():
+    for value in ['0', '-1']:
+        with pytest.raises(SystemExit):
+            snykjar.parse_command_line_args(['--maxCandidates=%s' % value, 'somejar1.jar'])
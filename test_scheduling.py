@@ -0,0 +1,248 @@
+import snykjar
+import os
+import tempfile
+import requests
+from mock import patch
+
+
+def make_package(group_id, artifact_id, version):
+    return {
+        'fullId': '%s:%s:%s' % (group_id, artifact_id, version),
+        'groupId': group_id,
+        'artifactId': artifact_id,
+        'version': version
+    }
+
+
+def make_issues():
+    return {
+        'vulnerabilities': [],
+        'licenses': []
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_analyze_jars_runs_filename_lookups_after_all_cheaper_work():
+    calls = []
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+    commons = make_package('commons-collections', 'commons-collections', '3.2.1')
+
+    def by_hash(jar_path, hash_cache=None, timeout=None):
+        calls.append(('hash', jar_path))
+        return [gson] if jar_path == 'gson-2.3.1.jar' else []
+
+    def by_contents(jar_path):
+        calls.append(('contents', jar_path))
+        return []
+
+    def by_filename(jar_path, timeout=None):
+        calls.append(('filename', jar_path))
+        return [commons]
+
+    def snyk_test(snyk_token, group_id, artifact_id, version, timeout=None):
+        calls.append(('test', artifact_id))
+        return make_issues()
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', side_effect=by_hash), \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents', side_effect=by_contents), \
+            patch('snykjar.get_package_info_by_jar_filename', side_effect=by_filename), \
+            patch('snykjar.snyk_test_java_package', side_effect=snyk_test):
+        results = snykjar.analyze_jars(['commons-collections-3.2.1.jar', 'gson-2.3.1.jar'], 'token', True)
+
+    assert calls == [
+        ('hash', 'commons-collections-3.2.1.jar'),
+        ('hash', 'gson-2.3.1.jar'),
+        ('contents', 'commons-collections-3.2.1.jar'),
+        ('test', 'gson'),
+        ('filename', 'commons-collections-3.2.1.jar'),
+        ('test', 'commons-collections'),
+    ]
+
+    assert results[0]['jar'] == 'commons-collections-3.2.1.jar'
+    assert results[0]['matching-packages'][0]['fullId'] == commons['fullId']
+    assert results[0]['matching-packages'][0]['vulnerabilities'] == []
+    assert results[0]['time-budget-exceeded'] is False
+    assert results[1]['jar'] == 'gson-2.3.1.jar'
+    assert results[1]['matching-packages'][0]['fullId'] == gson['fullId']
+    assert results[1]['time-budget-exceeded'] is False
+
+
+def test_analyze_jars_skips_work_once_time_budget_is_spent():
+    clock = FakeClock()
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+
+    def by_hash(jar_path, hash_cache=None, timeout=None):
+        clock.now += 1
+        return [gson] if jar_path == 'gson-2.3.1.jar' else []
+
+    def snyk_test(snyk_token, group_id, artifact_id, version, timeout=None):
+        clock.now += 1
+        return make_issues()
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', side_effect=by_hash), \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents') as by_contents, \
+            patch('snykjar.get_package_info_by_jar_filename') as by_filename, \
+            patch('snykjar.snyk_test_java_package', side_effect=snyk_test):
+        by_contents.return_value = []
+        results = snykjar.analyze_jars(['gson-2.3.1.jar', 'unknown-1.0.jar'], 'token', True,
+                                       time_budget=2, clock=clock)
+
+    assert by_filename.call_count == 0
+    assert results[0]['matching-packages'][0]['fullId'] == gson['fullId']
+    assert results[0]['matching-packages'][0]['vulnerabilities'] is None
+    assert results[0]['matching-packages'][0]['skipped'] == 'time-budget'
+    assert results[0]['time-budget-exceeded'] is True
+    assert results[1]['matching-packages'] == []
+    assert results[1]['time-budget-exceeded'] is True
+
+
+def test_analyze_jars_flags_jar_when_a_request_overruns_the_deadline():
+    clock = FakeClock()
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+    timeouts = []
+
+    def by_hash(jar_path, hash_cache=None, timeout=None):
+        timeouts.append(timeout)
+        clock.now += 1
+        return [gson]
+
+    def snyk_test(snyk_token, group_id, artifact_id, version, timeout=None):
+        timeouts.append(timeout)
+        clock.now += timeout
+        raise requests.exceptions.Timeout()
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', side_effect=by_hash), \
+            patch('snykjar.snyk_test_java_package', side_effect=snyk_test):
+        results = snykjar.analyze_jars(['gson-2.3.1.jar'], 'token', True, time_budget=5, clock=clock)
+
+    assert timeouts == [5, 4]
+    assert results[0]['matching-packages'][0]['vulnerabilities'] is None
+    assert results[0]['matching-packages'][0]['skipped'] == 'time-budget'
+    assert results[0]['time-budget-exceeded'] is True
+
+
+def test_analyze_jars_caps_request_timeouts():
+    with patch('snykjar.get_package_info_by_jar_file_hash', return_value=[]) as by_hash, \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents', return_value=[]), \
+            patch('snykjar.get_package_info_by_jar_filename', return_value=[]) as by_filename:
+        snykjar.analyze_jars(['thing-1.0.jar'], 'token', True, time_budget=3600, clock=FakeClock())
+        assert by_hash.call_args[1]['timeout'] == snykjar.max_request_timeout
+        assert by_filename.call_args[1]['timeout'] == snykjar.max_request_timeout
+
+        snykjar.analyze_jars(['thing-1.0.jar'], 'token', True)
+        assert by_hash.call_args[1]['timeout'] is None
+
+
+def test_analyze_jars_caps_filename_candidate_tests():
+    candidates = [make_package('group%s' % i, 'thing', '1.0') for i in range(5)]
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', return_value=[]), \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents', return_value=[]), \
+            patch('snykjar.get_package_info_by_jar_filename', return_value=candidates), \
+            patch('snykjar.snyk_test_java_package', return_value=make_issues()) as snyk_test:
+        results = snykjar.analyze_jars(['thing-1.0.jar'], 'token', True, max_candidates=2)
+
+    assert snyk_test.call_count == 2
+    matching_packages = results[0]['matching-packages']
+    assert len(matching_packages) == 5
+    assert [p['vulnerabilities'] for p in matching_packages] == [[], [], None, None, None]
+    assert [p['skipped'] for p in matching_packages] == [None, None, 'max-candidates', 'max-candidates', 'max-candidates']
+    assert results[0]['time-budget-exceeded'] is False
+
+
+def test_analyze_jars_tests_each_package_once():
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', return_value=[gson]), \
+            patch('snykjar.snyk_test_java_package', return_value=make_issues()) as snyk_test:
+        results = snykjar.analyze_jars(['a/gson-2.3.1.jar', 'b/gson-2.3.1.jar'], 'token', True)
+
+    assert snyk_test.call_count == 1
+    assert results[0]['matching-packages'][0]['vulnerabilities'] == []
+    assert results[1]['matching-packages'][0]['vulnerabilities'] == []
+
+
+def test_analyze_jars_serves_cached_test_results_after_the_deadline():
+    clock = FakeClock()
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+
+    def snyk_test(snyk_token, group_id, artifact_id, version, timeout=None):
+        clock.now += 10
+        return make_issues()
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', return_value=[gson]), \
+            patch('snykjar.snyk_test_java_package', side_effect=snyk_test) as snyk_test_mock:
+        results = snykjar.analyze_jars(['a/gson-2.3.1.jar', 'b/gson-2.3.1.jar'], 'token', True,
+                                       time_budget=5, clock=clock)
+
+    assert snyk_test_mock.call_count == 1
+    for r in results:
+        assert r['matching-packages'][0]['vulnerabilities'] == []
+        assert r['time-budget-exceeded'] is False
+
+
+def test_analyze_jars_never_passes_a_non_positive_timeout():
+    times = iter([0.0, 4.0, 5.0, 5.0, 5.0])
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', return_value=[]) as by_hash, \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents', return_value=[]) as by_contents:
+        results = snykjar.analyze_jars(['thing-1.0.jar'], 'token', True, time_budget=5,
+                                       clock=lambda: next(times))
+
+    assert by_hash.call_args[1]['timeout'] == 1.0
+    assert by_contents.call_count == 0
+    assert results[0]['time-budget-exceeded'] is True
+
+
+def test_analyze_jars_falls_back_when_a_request_times_out_before_the_deadline():
+    clock = FakeClock()
+    commons = make_package('commons-collections', 'commons-collections', '3.2.1')
+
+    def time_out(*args, **kwargs):
+        clock.now += kwargs['timeout']
+        raise requests.exceptions.Timeout()
+
+    with patch('snykjar.get_package_info_by_jar_file_hash', side_effect=time_out), \
+            patch('snykjar.get_package_info_by_analyzing_jar_contents', return_value=[]) as by_contents, \
+            patch('snykjar.get_package_info_by_jar_filename', return_value=[commons]) as by_filename, \
+            patch('snykjar.snyk_test_java_package', side_effect=time_out):
+        results = snykjar.analyze_jars(['commons-collections-3.2.1.jar'], 'token', True,
+                                       time_budget=3600, clock=clock)
+
+    assert by_contents.call_count == 1
+    assert by_filename.call_count == 1
+    assert results[0]['matching-packages'][0]['fullId'] == commons['fullId']
+    assert results[0]['matching-packages'][0]['vulnerabilities'] is None
+    assert results[0]['matching-packages'][0]['skipped'] == 'request-timeout'
+    assert results[0]['time-budget-exceeded'] is False
+
+
+def test_analyze_jars_serves_cached_hash_lookups_after_the_deadline():
+    clock = FakeClock()
+    gson = make_package('com.google.code.gson', 'gson', '2.3.1')
+
+    def by_hash(jar_path, hash_cache=None, timeout=None):
+        clock.now += 10
+        hash_cache[snykjar.compute_file_sha1(jar_path)] = [gson]
+        return [gson]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        jar_paths = [os.path.join(temp_dir, d + '-gson-2.3.1.jar') for d in ['a', 'b']]
+        for jar_path in jar_paths:
+            with open(jar_path, 'wb') as jar_file:
+                jar_file.write(b'same jar contents')
+
+        with patch('snykjar.get_package_info_by_jar_file_hash', side_effect=by_hash) as by_hash_mock:
+            results = snykjar.analyze_jars(jar_paths, 'token', False, time_budget=5, clock=clock)
+
+    assert by_hash_mock.call_count == 1
+    for r in results:
+        assert r['matching-packages'][0]['fullId'] == gson['fullId']
+        assert r['time-budget-exceeded'] is False